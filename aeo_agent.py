@@ -21,15 +21,23 @@ from __future__ import annotations
 
 import os
 import re
+import random
 import json
 import time
+import hashlib
 import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any, Dict, List, Optional, Tuple, Iterable
 
 import httpx
+import orjson
 from bs4 import BeautifulSoup
 from pydantic import BaseModel, Field, HttpUrl, ValidationError
 
+from llm_client import get_http
+
 # ---------------------- Logging ----------------------
 
 LOGGER = logging.getLogger("aeo_agent")
@@ -46,11 +54,18 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
 LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4o-mini")
 LLM_TEMPERATURE = float(os.getenv("LLM_TEMPERATURE", "0.0"))
 HTTP_TIMEOUT_SECONDS = int(os.getenv("HTTP_TIMEOUT_SECONDS", "30"))
+REVIEW_CONCURRENCY = max(1, int(os.getenv("AEO_REVIEW_CONCURRENCY", "4")))
+# short per-attempt timeout + retries beats one long wait on a stalled call
+LLM_TIMEOUT_SECONDS = float(os.getenv("AEO_LLM_TIMEOUT_SECONDS", "20"))
+LLM_MAX_ATTEMPTS = max(1, int(os.getenv("AEO_LLM_MAX_ATTEMPTS", "3")))
+LLM_CACHE_SIZE = int(os.getenv("AEO_LLM_CACHE_SIZE", "512"))  # 0 disables
 
 UA = "aseon-aeo-faq-agent/1.1 (+https://www.aseon.io/)"
 
 MAX_SNIPPET_WORDS = 80
 MAX_RAW_ANSWER_WORDS = 120
+# answers past this are only sent to the LLM up to here; still long enough to be judged "too long"
+MAX_PROMPT_ANSWER_WORDS = 2 * MAX_RAW_ANSWER_WORDS
 
 PROMO_TRIGGERS = [
     r"\b(contact|neem contact|boek|bestel|koop|klik hier|meld je aan|subscribe|sign ?up|demo aanvragen|afrekenen|betaling)\b",
@@ -75,10 +90,8 @@ def looks_like_question(text: str) -> bool:
     ))
 
 def truncate_words(text: str, max_words: int) -> str:
-    words = norm(text).split()
-    if len(words) <= max_words:
-        return " ".join(words)
-    return " ".join(words[:max_words])
+    # no norm() first: split() with no args already drops all runs of whitespace
+    return " ".join((text or "").split()[:max_words])
 
 def dedupe_by_question(qas: List["QAItem"]) -> List["QAItem"]:
     seen = set()
@@ -143,6 +156,17 @@ class Fetcher:
 
 # ---------------------- LLM Client ----------------------
 
+# identical (model, temperature, system, user) -> same completion; process-local LRU
+_LLM_CACHE: "OrderedDict[str, str]" = OrderedDict()
+_LLM_CACHE_LOCK = threading.Lock()
+
+def _llm_cache_key(model: str, temperature: float, system: str, user: str) -> str:
+    h = hashlib.sha256()
+    for part in (model, repr(temperature), system, user):
+        h.update(part.encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()
+
 class LLMClient:
     def __init__(self, api_key: str = OPENAI_API_KEY, model: str = LLM_MODEL, temperature: float = LLM_TEMPERATURE):
         self.api_key = api_key
@@ -155,25 +179,54 @@ class LLMClient:
     def chat(self, system: str, user: str) -> Optional[str]:
         if not self.available():
             return None
-        try:
-            url = "https://api.openai.com/v1/chat/completions"
-            headers = {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"}
-            payload = {
-                "model": self.model,
-                "temperature": self.temperature,
-                "messages": [
-                    {"role": "system", "content": system},
-                    {"role": "user", "content": user}
-                ]
-            }
-            with httpx.Client(timeout=HTTP_TIMEOUT_SECONDS) as client:
-                r = client.post(url, headers=headers, json=payload)
+        key = _llm_cache_key(self.model, self.temperature, system, user)
+        if LLM_CACHE_SIZE > 0:
+            with _LLM_CACHE_LOCK:
+                hit = _LLM_CACHE.get(key)
+                if hit is not None:
+                    _LLM_CACHE.move_to_end(key)
+                    return hit
+        url = "https://api.openai.com/v1/chat/completions"
+        headers = {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"}
+        payload = {
+            "model": self.model,
+            "temperature": self.temperature,
+            "messages": [
+                {"role": "system", "content": system},
+                {"role": "user", "content": user}
+            ]
+        }
+        content: Optional[str] = None
+        for attempt in range(LLM_MAX_ATTEMPTS):
+            try:
+                # shared pool from llm_client; keep-alive instead of a handshake per review
+                r = get_http().post(url, headers=headers, json=payload, timeout=LLM_TIMEOUT_SECONDS)
                 r.raise_for_status()
                 data = r.json()
-            return data["choices"][0]["message"]["content"].strip()
-        except Exception as e:
-            LOGGER.error("LLM chat error: %s", e)
+                content = data["choices"][0]["message"]["content"].strip()
+                break
+            except httpx.TransportError as e:  # timeouts, resets
+                err = e
+            except httpx.HTTPStatusError as e:
+                if e.response.status_code != 429 and e.response.status_code < 500:
+                    LOGGER.error("LLM chat error: %s", e)
+                    return None
+                err = e
+            except Exception as e:
+                LOGGER.error("LLM chat error: %s", e)
+                return None
+            LOGGER.warning("LLM chat failed (attempt %s): %s", attempt + 1, err)
+            if attempt + 1 < LLM_MAX_ATTEMPTS:
+                time.sleep(min(0.5 * (2 ** attempt), 4.0) + random.uniform(0, 0.25))
+        if content is None:
+            LOGGER.error("LLM chat error after %s attempts", LLM_MAX_ATTEMPTS)
             return None
+        if LLM_CACHE_SIZE > 0:
+            with _LLM_CACHE_LOCK:
+                _LLM_CACHE[key] = content
+                if len(_LLM_CACHE) > LLM_CACHE_SIZE:
+                    _LLM_CACHE.popitem(last=False)
+        return content
 
 # ---------------------- Extractors ----------------------
 
@@ -184,7 +237,7 @@ def extract_qas_from_schema(soup: BeautifulSoup) -> List[QAItem]:
         if not raw.strip():
             continue
         try:
-            data = json.loads(raw)
+            data = orjson.loads(raw)
         except Exception:
             continue
         blocks = data if isinstance(data, list) else [data]
@@ -326,8 +379,8 @@ def _llm_json_parse(s: str) -> Optional[Dict[str, Any]]:
         start = s.find("{")
         end = s.rfind("}")
         if start != -1 and end != -1 and end > start:
-            return json.loads(s[start:end+1])
-        return json.loads(s)
+            return orjson.loads(s[start:end+1])
+        return orjson.loads(s)
     except Exception:
         return None
 
@@ -338,7 +391,8 @@ class Reviewer:
     def review_one(self, qa: QAItem) -> QAReview:
         # LLM path
         if self.llm.available():
-            prompt = f"Question:\n{qa.question}\n\nAnswer:\n{qa.answer}\n\nReturn JSON now with exactly these keys: is_good, issues, improved_question, improved_answer"
+            answer = truncate_words(qa.answer, MAX_PROMPT_ANSWER_WORDS)
+            prompt = f"Question:\n{norm(qa.question)}\n\nAnswer:\n{answer}\n\nReturn JSON now with exactly these keys: is_good, issues, improved_question, improved_answer"
             raw = self.llm.chat(LLM_SYSTEM, prompt)
             if raw:
                 data = _llm_json_parse(raw)
@@ -371,7 +425,11 @@ class Reviewer:
         })
 
     def review_many(self, qas: List[QAItem]) -> List[QAReview]:
-        return [self.review_one(qa) for qa in qas]
+        # each review is one LLM round-trip; run them concurrently, keep input order
+        if len(qas) <= 1 or REVIEW_CONCURRENCY == 1:
+            return [self.review_one(qa) for qa in qas]
+        with ThreadPoolExecutor(max_workers=min(REVIEW_CONCURRENCY, len(qas))) as ex:
+            return list(ex.map(self.review_one, qas))
 
 # ---------------------- JSON-LD Builder & Validation ----------------------
 
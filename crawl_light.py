@@ -4,11 +4,11 @@
 import os
 import re
 import gc
-import json
 from typing import Any, Dict, List, Optional, Tuple
 from urllib.parse import urljoin, urlparse, urlunparse
 
 import requests
+import orjson
 from bs4 import BeautifulSoup, NavigableString, Tag
 
 DEFAULT_TIMEOUT = float(os.getenv("CRAWL_TIMEOUT_SEC", "10"))
@@ -25,13 +25,20 @@ QUESTION_PREFIXES = (
     "wat ","hoe ","waarom ","wanneer ","kan ","doet ","doen ","is ","zijn ","moet ","zal ","waar ","wie "
 )
 
+_SKIP_EXT_T = tuple(sorted(_SKIP_EXT))
+_ASSET_RX = re.compile(
+    r"^[^?#]*\.(?:" + "|".join(sorted(e[1:] for e in _SKIP_EXT)) + r")(?:[?#]|$)"
+)
+_WS_RX = re.compile(r"\s+")
+_MULTI_SLASH_RX = re.compile(r"/{2,}")
+_Q_PREFIX_RX = re.compile(r"^(q|vraag)\s*[:\-–]\s+\S")
+_FAQ_CLASS_HINTS = re.compile(r"(faq|accordion|question|qna|q-and-a)", re.I)
+
 def _seems_asset(url: str) -> bool:
-    try:
-        path = urlparse(url).path.lower()
-        ext = (path.rsplit(".", 1)[-1] if "." in path else "")
-        return ("."+ext) in _SKIP_EXT
-    except Exception:
-        return False
+    low = (url or "").lower()
+    if "?" not in low and "#" not in low:
+        return low.endswith(_SKIP_EXT_T)
+    return _ASSET_RX.search(low) is not None
 
 def _norm_url(url: str) -> str:
     try:
@@ -39,7 +46,7 @@ def _norm_url(url: str) -> str:
         if not u.scheme:
             return ""
         netloc = u.netloc.lower()
-        path = re.sub(r"/{2,}", "/", u.path or "/")
+        path = _MULTI_SLASH_RX.sub("/", u.path or "/")
         return urlunparse((u.scheme, netloc, path, "", u.query, ""))
     except Exception:
         return ""
@@ -51,7 +58,7 @@ def _same_host(a: str, b: str) -> bool:
         return False
 
 def _clean(s: str) -> str:
-    s = re.sub(r"\s+", " ", (s or "")).strip()
+    s = _WS_RX.sub(" ", (s or "")).strip()
     return s
 
 def _text_of(node: Tag) -> str:
@@ -65,15 +72,13 @@ def _text_of(node: Tag) -> str:
         bad.decompose()
     return _clean(node.get_text(separator=" "))
 
+_PUNCT_TABLE = str.maketrans({
+    "\u2018": "'", "\u2019": "'", "\u201C": '"', "\u201D": '"',
+    "\u2013": "-", "\u2014": "-", "\u2026": "...", "\u00A0": " "
+})
+
 def _normalize_punct(s: str) -> str:
-    t = (s or "")
-    repl = {
-        "\u2018": "'", "\u2019": "'", "\u201C": '"', "\u201D": '"',
-        "\u2013": "-", "\u2014": "-", "\u2026": "...", "\u00A0": " "
-    }
-    for k,v in repl.items():
-        t = t.replace(k, v)
-    return t
+    return (s or "").translate(_PUNCT_TABLE)
 
 def _looks_like_question(text: str) -> bool:
     if not text:
@@ -84,7 +89,7 @@ def _looks_like_question(text: str) -> bool:
         return True
     if any(low.startswith(p) for p in QUESTION_PREFIXES):
         return True
-    if re.match(r"^(q|vraag)\s*[:\-–]\s+\S", low):
+    if _Q_PREFIX_RX.match(low):
         return True
     return False
 
@@ -213,8 +218,7 @@ def _webflow_qas(soup: BeautifulSoup) -> List[Dict[str,str]]:
 
 def _class_based_faq_qas(soup: BeautifulSoup) -> List[Dict[str,str]]:
     out: List[Dict[str,str]] = []
-    FAQ_CLASS_HINTS = re.compile(r"(faq|accordion|question|qna|q-and-a)", re.I)
-    for container in soup.find_all(attrs={"class": FAQ_CLASS_HINTS}):
+    for container in soup.find_all(attrs={"class": _FAQ_CLASS_HINTS}):
         q_el = None
         for tag in ["h2","h3","h4","h5","button","summary"]:
             q_el = container.find(tag)
@@ -257,13 +261,13 @@ def _extract_jsonld(soup: BeautifulSoup) -> Tuple[List[Any], List[Any]]:
         # strip HTML comments if present
         txt = re.sub(r"<!--.*?-->", "", txt, flags=re.S)
         try:
-            obj = json.loads(txt)
+            obj = orjson.loads(txt)
         except Exception:
             # relaxed: remove JS-style comments and retry
             txt_relaxed = re.sub(r"/\*.*?\*/", "", txt, flags=re.S)
             txt_relaxed = re.sub(r"(^|\s)//.*?$", "", txt_relaxed, flags=re.M)
             try:
-                obj = json.loads(txt_relaxed)
+                obj = orjson.loads(txt_relaxed)
             except Exception:
                 continue
         raw_blocks.append(obj)
@@ -321,11 +325,7 @@ def _extract_links(soup: BeautifulSoup, base: str) -> List[str]:
         if not url: continue
         if _seems_asset(url): continue
         out.append(url)
-    seen = set(); deduped=[]
-    for u in out:
-        if u not in seen:
-            seen.add(u); deduped.append(u)
-    return deduped
+    return list(dict.fromkeys(out))  # ordered dedupe
 
 def _fetch(url: str, ua: Optional[str]) -> Tuple[int, str, str, bool]:
     headers = {"User-Agent": ua or "AseonBot/0.6 (+https://aseon.ai)"}
@@ -420,13 +420,22 @@ def crawl_site(start_url: str, max_pages: int = MAX_PAGES, ua: Optional[str] = N
         if len(pages) % 5 == 0:
             gc.collect()
 
-    title_lengths = [len((p.get("title") or "")) for p in pages]
-    canonical_differs = [p for p in pages if p.get("canonical") and _norm_url(p["canonical"]) != p["url"]]
+    # one pass over pages for every summary counter
+    title_total = faq_pages = faq_schema = 0
+    canonical_differs = False
+    for p in pages:
+        title_total += len(p.get("title") or "")
+        if p.get("faq_visible") or p.get("faq_jsonld"):
+            faq_pages += 1
+        if (p.get("metrics") or {}).get("has_faq_schema"):
+            faq_schema += 1
+        if not canonical_differs and p.get("canonical") and _norm_url(p["canonical"]) != p["url"]:
+            canonical_differs = True
     summary = {
         "page_count": len(pages),
-        "avg_title_len": (sum(title_lengths)/len(title_lengths)) if title_lengths else 0,
-        "faq_pages": sum(1 for p in pages if p.get("faq_visible") or p.get("faq_jsonld")),
-        "has_faq_schema_count": sum(1 for p in pages if bool((p.get("metrics") or {}).get("has_faq_schema"))),
+        "avg_title_len": (title_total/len(pages)) if pages else 0,
+        "faq_pages": faq_pages,
+        "has_faq_schema_count": faq_schema,
     }
     quick_wins = []
     if canonical_differs:
@@ -2,25 +2,19 @@
 import os
 import json
 import re
+import orjson
 from typing import Dict, Any, List, Optional
-from openai import OpenAI
 from psycopg.rows import dict_row
 
 from rag_helper import search_site_docs, search_kb, build_context
+from llm_client import get_client as _get_client
 
 CHAT_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
 OPENAI_TIMEOUT_SEC = float(os.getenv("OPENAI_TIMEOUT_SEC", "20"))
 MAX_CTX_CHARS = int(os.getenv("FAQ_MAX_CTX_CHARS", "3500"))
 
-client = OpenAI(api_key=os.environ["OPENAI_API_KEY"])
-
-
 def _cap_words(s: str, max_words: int) -> str:
-    s = re.sub(r"\s+", " ", (s or "").strip())
-    if not s:
-        return s
-    words = s.split(" ")
-    return " ".join(words[:max_words])
+    return " ".join((s or "").split()[:max_words])
 
 
 def _clean_url(u: Optional[str]) -> Optional[str]:
@@ -32,22 +26,37 @@ def _clean_url(u: Optional[str]) -> Optional[str]:
     return None
 
 
+# fixed text: the per-request count and word cap are sent in the user turn
+_SYSTEM = (
+    "You write concise, factual FAQs grounded ONLY in the provided context.\n"
+    "Return exactly the number of Q/A pairs requested in the user message, "
+    "each answer within the stated word limit. JSON only.\n"
+    "Rules:\n"
+    "- Prefer facts from [S#] site snippets; fall back to [K#] policy/best practices.\n"
+    '- Every FAQ must include a "source": ONE best URL (prefer site). If nothing supports it, use null.\n'
+    '- No fluff or speculation; if unknown from context, state "Cannot answer from context.".\n'
+    'Return:\n{"faqs":[{"q":"...","a":"...","source":"https://...|null"}]}'
+)
+
+
 def _fallback_crawl_snapshot(conn, site_id: str, max_pages: int = 6) -> str:
     try:
         with conn.cursor(row_factory=dict_row) as cur:
             cur.execute(
                 """
-                SELECT output
+                SELECT jsonb_path_query_array(
+                         output, '$.pages[0 to $last]', jsonb_build_object('last', %s::int)
+                       ) AS pages
                   FROM jobs
                  WHERE site_id=%s AND type='crawl' AND status='done'
-              ORDER BY COALESCE(finished_at, created_at) DESC
+              ORDER BY finished_at DESC NULLS LAST, created_at DESC
                  LIMIT 1
             """,
-                (site_id,),
+                (max_pages - 1, site_id),
             )
             r = cur.fetchone()
-        out = (r or {}).get("output") or {}
-        pages = out.get("pages") or []
+        # only the first max_pages pages leave the server
+        pages = (r or {}).get("pages") or []
         bits: List[str] = []
         for p in pages[:max_pages]:
             url = p.get("final_url") or p.get("url") or ""
@@ -126,11 +135,12 @@ def _normalize_source(
 
 
 def generate_faqs(conn, site_id: str, payload: Dict[str, Any]) -> Dict[str, Any]:
-    topic = (payload or {}).get("topic") or "general"
-    count = int((payload or {}).get("count", 6))
-    max_words = int((payload or {}).get("max_words", 80))
-    kb_tags = (payload or {}).get("kb_tags") or ["Schema", "SEO", "AEO", "Content", "Quality"]
-    use_context = (payload or {}).get("use_context", "auto")
+    payload = payload or {}
+    topic = payload.get("topic") or "general"
+    count = int(payload.get("count", 6))
+    max_words = int(payload.get("max_words", 80))
+    kb_tags = payload.get("kb_tags") or ["Schema", "SEO", "AEO", "Content", "Quality"]
+    use_context = payload.get("use_context", "auto")
 
     site_rows: List[dict] = []
     kb_rows: List[dict] = []
@@ -151,17 +161,8 @@ def generate_faqs(conn, site_id: str, payload: Dict[str, Any]) -> Dict[str, Any]
         extra = "\n".join([f"[S*] Crawl Snapshot\n{crawl_ctx}"])
         full_site_ctx = (full_site_ctx + "\n" + extra).strip()
 
-    system = (
-        f"You write concise, factual FAQs grounded ONLY in the provided context.\n"
-        f"Return EXACTLY {count} Q/A pairs. Each answer ≤ {max_words} words. JSON only.\n"
-        "Rules:\n"
-        "- Prefer facts from [S#] site snippets; fall back to [K#] policy/best practices.\n"
-        '- Every FAQ must include a "source": ONE best URL (prefer site). If nothing supports it, use null.\n'
-        '- No fluff or speculation; if unknown from context, state "Cannot answer from context.".\n'
-        'Return:\n{"faqs":[{"q":"...","a":"...","source":"https://...|null"}]}'
-    )
-
-    user = f"""Topic: {topic}
+    user = f"""Return EXACTLY {count} Q/A pairs. Each answer ≤ {max_words} words.
+Topic: {topic}
 
 --- SITE CONTEXT ---
 {full_site_ctx}
@@ -170,17 +171,17 @@ def generate_faqs(conn, site_id: str, payload: Dict[str, Any]) -> Dict[str, Any]
 {ctx.get("kb_ctx") or ""}
 """
 
-    resp = client.chat.completions.create(
+    resp = _get_client().chat.completions.create(
         model=CHAT_MODEL,
         temperature=0.2,
         timeout=OPENAI_TIMEOUT_SEC,
         response_format={"type": "json_object"},
-        messages=[{"role": "system", "content": system}, {"role": "user", "content": user}],
+        messages=[{"role": "system", "content": _SYSTEM}, {"role": "user", "content": user}],
     )
 
     faqs: List[Dict[str, Any]] = []
     try:
-        data = json.loads(resp.choices[0].message.content)
+        data = orjson.loads(resp.choices[0].message.content)
         raw = data.get("faqs") or []
     except Exception:
         raw = []
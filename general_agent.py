@@ -10,7 +10,8 @@ from datetime import datetime, timezone
 import psycopg
 from psycopg.rows import dict_row
 from psycopg_pool import ConnectionPool
-from psycopg.types.json import Json
+from psycopg.types.json import set_json_loads
+import orjson
 
 from crawl_light import crawl_site
 from keywords_agent import generate_keywords
@@ -24,10 +25,18 @@ POLL_INTERVAL_SEC = float(os.getenv("POLL_INTERVAL_SEC", "2"))
 BATCH_SIZE = int(os.getenv("BATCH_SIZE", "1"))
 MAX_ERROR_LEN = 500
 INGEST_ENABLED = os.getenv("INGEST_ENABLED", "true").lower() == "true"
+# the poll/claim/finish statements repeat forever; prepare them on first use (psycopg default: 5th)
+PG_PREPARE_THRESHOLD = int(os.getenv("PG_PREPARE_THRESHOLD", "0"))
+SITE_INFO_TTL_SEC = float(os.getenv("SITE_INFO_TTL_SEC", "300"))  # 0 disables
+
+_site_info_cache = {}
 
 DSN = os.environ["DATABASE_URL"]
 running = True
 
+# crawl outputs are read back as JSONB; orjson decodes them much faster
+set_json_loads(orjson.loads)
+
 
 def log(level, msg, **kwargs):
     payload = {
@@ -49,7 +58,7 @@ signal.signal(signal.SIGTERM, handle_sigterm)
 signal.signal(signal.SIGINT, handle_sigterm)
 
 
-def normalize_output(obj):
+def encode_output(obj):
     def default(o):
         if isinstance(o, datetime):
             return o.isoformat()
@@ -57,7 +66,11 @@ def normalize_output(obj):
             return str(o)
         return str(o)
 
-    return json.loads(json.dumps(obj, default=default))
+    # orjson encodes datetime/UUID natively (same ISO strings); stdlib path for what it rejects
+    try:
+        return orjson.dumps(obj, default=default, option=orjson.OPT_NON_STR_KEYS)
+    except orjson.JSONEncodeError:
+        return json.dumps(obj, default=default).encode("utf-8")
 
 
 def claim_one_job(conn):
@@ -95,23 +108,21 @@ def finish_job(conn, job_id, ok, output=None, err=None):
                         "at": datetime.now(timezone.utc).isoformat(),
                     }
                 }
-            safe_output = normalize_output(safe_output)
-            try:
-                preview = json.dumps(safe_output)[:400]
-            except Exception:
-                preview = "<unserializable>"
+            # encode once: the same bytes feed the log preview and the UPDATE
+            raw = encode_output(safe_output)
+            preview = raw[:400].decode("utf-8", "ignore")
             log("info", "finish_job_pre_write", job_id=str(job_id), preview=preview)
             cur.execute(
                 """
                 UPDATE jobs
                    SET status='done',
-                       output=%s,
+                       output=%s::jsonb,
                        finished_at=NOW(),
                        error=NULL
                  WHERE id=%s
-             RETURNING jsonb_typeof(output) AS out_type, output;
+             RETURNING jsonb_typeof(output) AS out_type;
                 """,
-                (Json(safe_output), job_id),
+                (raw.decode("utf-8"), job_id),
             )
             cur.fetchone()
             conn.commit()
@@ -131,7 +142,7 @@ def finish_job(conn, job_id, ok, output=None, err=None):
             log("error", "finish_job_failed_write", job_id=str(job_id), error=err_text)
 
 
-def get_site_info(conn, site_id):
+def _load_site_info(conn, site_id):
     with conn.cursor(row_factory=dict_row) as cur:
         cur.execute(
             """
@@ -154,25 +165,58 @@ def get_site_info(conn, site_id):
         return row
 
 
-def get_latest_job_output(conn, site_id, jtype):
+def get_site_info(conn, site_id):
+    # site rows rarely change; every job reads one, so keep them for SITE_INFO_TTL_SEC
+    key = str(site_id)
+    hit = _site_info_cache.get(key)
+    if hit and time.time() - hit[0] < SITE_INFO_TTL_SEC:
+        return dict(hit[1])
+    row = _load_site_info(conn, site_id)
+    if SITE_INFO_TTL_SEC > 0:
+        if len(_site_info_cache) >= 2048:
+            _site_info_cache.clear()
+        _site_info_cache[key] = (time.time(), dict(row))
+    return row
+
+
+def get_latest_job_output(conn, site_id, jtype, keys=None):
+    # keys: only these top-level output keys are sent back (crawl outputs run to MBs)
     with conn.cursor(row_factory=dict_row) as cur:
-        cur.execute(
-            """
-            SELECT output
-              FROM jobs
-             WHERE site_id=%s AND type=%s AND status='done'
-             ORDER BY finished_at DESC NULLS LAST, created_at DESC
-             LIMIT 1
-            """,
-            (site_id, jtype),
-        )
+        if keys:
+            cur.execute(
+                """
+                SELECT (SELECT jsonb_object_agg(e.key, e.value)
+                          FROM jsonb_each(output) e
+                         WHERE e.key = ANY(%s)) AS output
+                  FROM jobs
+                 WHERE site_id=%s AND type=%s AND status='done'
+                 ORDER BY finished_at DESC NULLS LAST, created_at DESC
+                 LIMIT 1
+                """,
+                (list(keys), site_id, jtype),
+                prepare=True,
+            )
+        else:
+            cur.execute(
+                """
+                SELECT output
+                  FROM jobs
+                 WHERE site_id=%s AND type=%s AND status='done'
+                 ORDER BY finished_at DESC NULLS LAST, created_at DESC
+                 LIMIT 1
+                """,
+                (site_id, jtype),
+                prepare=True,
+            )
         r = cur.fetchone()
-        return (r or {}).get("output") if r else None
+    out = r["output"] if r else None
+    return out if isinstance(out, dict) else {}
 
 
 def run_crawl(conn, site_id, payload):
-    max_pages = int((payload or {}).get("max_pages", 10))
-    ua = (payload or {}).get("user_agent") or "AseonBot/0.1 (+https://aseon.ai)"
+    payload = payload or {}
+    max_pages = int(payload.get("max_pages", 10))
+    ua = payload.get("user_agent") or "AseonBot/0.1 (+https://aseon.ai)"
     site = get_site_info(conn, site_id)
     result = crawl_site(site["url"], max_pages=max_pages, ua=ua)
     if INGEST_ENABLED:
@@ -186,26 +230,28 @@ def run_crawl(conn, site_id, payload):
 
 def run_keywords(conn, site_id, payload):
     site = get_site_info(conn, site_id)
-    market = (payload or {}).get("market", {}) or {}
+    payload = dict(payload or {})
+    market = dict(payload.get("market") or {})
     market.setdefault("language", site.get("language") or "en")
     market.setdefault("country", site.get("country") or "NL")
-    payload = dict(payload or {})
     payload["market"] = market
     return generate_keywords(conn, site_id, payload)
 
 
 def run_schema(conn, site_id, payload):
     site = get_site_info(conn, site_id)
-    biz_type = (payload or {}).get("biz_type", "Organization")
-    extras = (payload or {}).get("extras") or {}
-    use_ctx = (payload or {}).get("use_context", "auto")
-    count = int((payload or {}).get("count", 3))
+    payload = payload or {}
+    biz_type = payload.get("biz_type", "Organization")
+    extras = payload.get("extras") or {}
+    use_ctx = payload.get("use_context", "auto")
+    count = int(payload.get("count", 3))
     faqs_for_schema = None
     context_used = "none"
     if biz_type == "FAQPage" and use_ctx in ("auto", "faq", "documents", "crawl"):
-        latest_faq = get_latest_job_output(conn, site_id, "faq")
-        if latest_faq and isinstance(latest_faq.get("faqs"), list) and latest_faq["faqs"]:
-            faqs_for_schema = latest_faq["faqs"]
+        latest_faq = get_latest_job_output(conn, site_id, "faq", keys=("faqs",))
+        faqs = latest_faq.get("faqs")
+        if isinstance(faqs, list) and faqs:
+            faqs_for_schema = faqs
             context_used = "faq"
     data = generate_schema(
         biz_type=biz_type,
@@ -275,7 +321,9 @@ def main():
         marker="AGENT_VERSION_AEO_ENABLED",
         ingest_enabled=INGEST_ENABLED,
     )
-    pool = ConnectionPool(DSN, min_size=1, max_size=4, kwargs={"row_factory": dict_row})
+    pool = ConnectionPool(DSN, min_size=1, max_size=4,
+                          kwargs={"row_factory": dict_row, "prepare_threshold": PG_PREPARE_THRESHOLD},
+                          check=ConnectionPool.check_connection)
     while running:
         try:
             with pool.connection() as conn:
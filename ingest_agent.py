@@ -1,8 +1,8 @@
 # ingest_agent.py
 import os, json, time, hashlib
 from typing import List, Dict, Any, Optional
-from openai import OpenAI
 from openai._exceptions import OpenAIError, APIConnectionError, RateLimitError
+from llm_client import get_client as _get_client, EMBED_KW
 
 EMBED_MODEL = os.getenv("EMBED_MODEL", "text-embedding-3-small")
 OPENAI_TIMEOUT_SEC = float(os.getenv("OPENAI_TIMEOUT_SEC", "20"))
@@ -12,8 +12,6 @@ INGEST_TIME_BUDGET_SEC   = int(os.getenv("INGEST_TIME_BUDGET_SEC", "90"))
 INGEST_MAX_CHUNKS_TOTAL  = int(os.getenv("INGEST_MAX_CHUNKS_TOTAL", "120"))
 INGEST_MAX_CHUNKS_PAGE   = int(os.getenv("INGEST_MAX_CHUNKS_PER_PAGE", "8"))
 
-client = OpenAI(api_key=os.environ["OPENAI_API_KEY"])
-
 def _chunk_text(text: str, max_chars: int = 1500, overlap: int = 150) -> List[str]:
     text = (text or "").strip()
     if not text:
@@ -45,10 +43,11 @@ def _embed_with_retry(text: str) -> Optional[List[float]]:
     last_err = None
     for attempt in range(1, OPENAI_MAX_RETRIES + 1):
         try:
-            resp = client.embeddings.create(
+            resp = _get_client().embeddings.create(
                 model=EMBED_MODEL,
                 input=[text],
                 timeout=OPENAI_TIMEOUT_SEC,
+                **EMBED_KW,
             )
             return resp.data[0].embedding
         except (RateLimitError, APIConnectionError, OpenAIError, TimeoutError, Exception) as e:
@@ -70,6 +69,14 @@ def ingest_crawl_output(conn, site_id: str, crawl_output: Dict[str, Any]) -> int
 
     inserted = 0
     with conn.cursor() as cur:
+        # one round-trip for the dedup check instead of a SELECT per chunk
+        urls = list({p.get("final_url") or p.get("url") for p in pages} - {None, ""})
+        cur.execute("""
+            SELECT url, content_hash FROM documents
+             WHERE site_id=%s AND url = ANY(%s)
+        """, (site_id, urls))
+        existing = {(r[0], r[1]) for r in cur.fetchall()}
+
         for p_idx, p in enumerate(pages):
             if time.time() - started > INGEST_TIME_BUDGET_SEC or inserted >= INGEST_MAX_CHUNKS_TOTAL:
                 print(json.dumps({"level":"WARN","msg":"ingest_budget_reached","after_pages":p_idx,"inserted":inserted}), flush=True)
@@ -88,13 +95,7 @@ def ingest_crawl_output(conn, site_id: str, crawl_output: Dict[str, Any]) -> int
                     break
 
                 chash = _hash(chunk)
-
-                cur.execute("""
-                    SELECT 1 FROM documents
-                     WHERE site_id=%s AND url=%s AND content_hash=%s
-                     LIMIT 1
-                """, (site_id, url, chash))
-                if cur.fetchone():
+                if (url, chash) in existing:
                     continue
 
                 emb = _embed_with_retry(chunk)
@@ -106,6 +107,7 @@ def ingest_crawl_output(conn, site_id: str, crawl_output: Dict[str, Any]) -> int
                         INSERT INTO documents (site_id, url, language, content, metadata, embedding, content_hash)
                         VALUES (%s, %s, NULL, %s, %s, %s, %s)
                     """, (site_id, url, chunk, json.dumps({"source":"crawl"}), emb, chash))
+                    existing.add((url, chash))
                     inserted += 1
                 except Exception as db_err:
                     try: conn.rollback()
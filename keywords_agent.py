@@ -2,16 +2,37 @@
 import os
 import json
 import re
+import orjson
 from typing import Dict, Any, List
-from openai import OpenAI
 
 from rag_helper import search_site_docs, search_kb, build_context
+from llm_client import get_client as _get_client
 
 CHAT_MODEL  = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
 OPENAI_TIMEOUT_SEC = float(os.getenv("OPENAI_TIMEOUT_SEC", "20"))
 MAX_CTX_CHARS = int(os.getenv("KW_MAX_CTX_CHARS", "4000"))
 
-client = OpenAI(api_key=os.environ["OPENAI_API_KEY"])
+# never formatted, so the cached prompt prefix is identical for every market/seed
+_SYSTEM = """
+You are an SEO+GEO strategist for the market given in the user message (country, language).
+Use ONLY the provided context. Return JSON only.
+Structure:
+{
+  "keywords": ["..."],                       // 20–50 total
+  "clusters": {
+    "informational": ["..."],
+    "transactional": ["..."],
+    "navigational": ["..."]
+  },
+  "suggestions": [
+    {"page_title":"...","grouped_keywords":["...","..."],"notes":"answer-first outline & evidence to include"}
+  ]
+}
+Rules:
+- Mix classic SEO queries and assistant-style prompts.
+- Prefer entities/terms present in the site context.
+- Keep on-topic; no generic or off-vertical queries.
+""".strip()
 
 
 def _dedupe_keep_order(xs: List[str]) -> List[str]:
@@ -26,9 +47,10 @@ def _dedupe_keep_order(xs: List[str]) -> List[str]:
 
 
 def generate_keywords(conn, site_id: str, payload: Dict[str, Any]) -> Dict[str, Any]:
-    seed = (payload or {}).get("seed") or "site"
-    n = int((payload or {}).get("n", 30))
-    market = (payload or {}).get("market", {}) or {}
+    payload = payload or {}
+    seed = payload.get("seed") or "site"
+    n = int(payload.get("n", 30))
+    market = payload.get("market") or {}
     language = (market.get("language") or "en").lower()
     country  = (market.get("country")  or "NL").upper()
 
@@ -36,28 +58,8 @@ def generate_keywords(conn, site_id: str, payload: Dict[str, Any]) -> Dict[str,
     kb_rows   = search_kb(conn, seed, k=6, tags=["Schema","SEO","AEO","Content","Quality"])
     ctx = build_context(site_rows, kb_rows, budget_chars=MAX_CTX_CHARS)
 
-    system = f"""
-You are an SEO+GEO strategist for {country} ({language}).
-Use ONLY the provided context. Return JSON only.
-Structure:
-{{
-  "keywords": ["..."],                       // 20–50 total
-  "clusters": {{
-    "informational": ["..."],
-    "transactional": ["..."],
-    "navigational": ["..."]
-  }},
-  "suggestions": [
-    {{"page_title":"...","grouped_keywords":["...","..."],"notes":"answer-first outline & evidence to include"}}
-  ]
-}}
-Rules:
-- Mix classic SEO queries and assistant-style prompts.
-- Prefer entities/terms present in the site context.
-- Keep on-topic; no generic or off-vertical queries.
-""".strip()
-
-    user = f"""Seed/topic: {seed}
+    user = f"""Market: {country} ({language})
+Seed/topic: {seed}
 
 --- SITE CONTEXT ---
 {ctx.get("site_ctx")}
@@ -66,16 +68,16 @@ Rules:
 {ctx.get("kb_ctx")}
 """
 
-    resp = client.chat.completions.create(
+    resp = _get_client().chat.completions.create(
         model=CHAT_MODEL,
         temperature=0.35,
         timeout=OPENAI_TIMEOUT_SEC,
         response_format={"type":"json_object"},
-        messages=[{"role":"system","content":system},{"role":"user","content":user}],
+        messages=[{"role":"system","content":_SYSTEM},{"role":"user","content":user}],
     )
 
     try:
-        data = json.loads(resp.choices[0].message.content)
+        data = orjson.loads(resp.choices[0].message.content)
     except Exception:
         data = {"keywords": [], "clusters": {"informational":[],"transactional":[],"navigational":[]}, "suggestions": []}
 
@@ -1,15 +1,43 @@
 # llm.py
-import os
+import os, time, hashlib, threading
+import orjson
 from typing import List, Optional, Dict, Any
 from fastapi import APIRouter, HTTPException, Request, Body
 from pydantic import BaseModel
 from openai import OpenAI
 from rag_helper import get_rag_context  # bestaat al
+from llm_client import get_client
 
 router = APIRouter()
 
 OPENAI_MODEL = os.getenv("LLM_MODEL", "gpt-4o-mini")
 OPENAI_TIMEOUT_SEC = float(os.getenv("OPENAI_TIMEOUT_SEC", "30"))
+ANSWER_CACHE_TTL_SEC = float(os.getenv("LLM_ANSWER_CACHE_TTL_SEC", "600"))  # 0 disables
+ANSWER_CACHE_MAX = int(os.getenv("LLM_ANSWER_CACHE_MAX", "256"))
+
+# sha256(model + messages) -> (stored_at, answer); same query over same context => same answer
+_answer_cache: Dict[str, Any] = {}
+_answer_lock = threading.Lock()
+
+def _answer_key(messages: List[Dict[str, str]]) -> str:
+    return hashlib.sha256(orjson.dumps([OPENAI_MODEL, messages], option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+def _answer_get(key: str) -> Optional[str]:
+    if ANSWER_CACHE_TTL_SEC <= 0: return None
+    with _answer_lock:
+        hit = _answer_cache.get(key)
+        if not hit: return None
+        if time.time() - hit[0] > ANSWER_CACHE_TTL_SEC:
+            _answer_cache.pop(key, None)
+            return None
+        return hit[1]
+
+def _answer_put(key: str, answer: str) -> None:
+    if ANSWER_CACHE_TTL_SEC <= 0: return
+    with _answer_lock:
+        if len(_answer_cache) >= ANSWER_CACHE_MAX:
+            _answer_cache.pop(next(iter(_answer_cache)))  # oldest insert
+        _answer_cache[key] = (time.time(), answer)
 
 def _to_list(v) -> Optional[List[str]]:
     if v is None: return None
@@ -57,9 +85,7 @@ Instructions:
     return [{"role":"system","content":system},{"role":"user","content":user}]
 
 def _client() -> OpenAI:
-    key = os.getenv("OPENAI_API_KEY")
-    if not key: raise RuntimeError("OPENAI_API_KEY is not set")
-    return OpenAI(api_key=key)
+    return get_client()  # shared pooled client; raises if OPENAI_API_KEY is unset
 
 def _conn_from(request: Request):
     pool = getattr(request.app.state, "pool", None)
@@ -82,14 +108,18 @@ def llm_answer(request: Request, body: LLMAnswerRequest = Body(...)):
 
         messages = build_prompt(ctx, body.query, body.format or "markdown")
 
-        client = _client()
-        resp = client.chat.completions.create(
-            model=OPENAI_MODEL,
-            temperature=0.2,
-            messages=messages,
-            timeout=OPENAI_TIMEOUT_SEC,
-        )
-        answer = resp.choices[0].message.content.strip()
+        key = _answer_key(messages)
+        answer = _answer_get(key)
+        if answer is None:
+            client = _client()
+            resp = client.chat.completions.create(
+                model=OPENAI_MODEL,
+                temperature=0.2,
+                messages=messages,
+                timeout=OPENAI_TIMEOUT_SEC,
+            )
+            answer = resp.choices[0].message.content.strip()
+            _answer_put(key, answer)
 
         return LLMAnswerResponse(
             answer=answer,
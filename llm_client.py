@@ -0,0 +1,55 @@
+# llm_client.py
+import os
+import threading
+from typing import Optional
+
+import httpx
+from openai import OpenAI
+
+OPENAI_TIMEOUT_SEC = float(os.getenv("OPENAI_TIMEOUT_SEC", "30"))
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "128"))
+OPENAI_MAX_KEEPALIVE = int(os.getenv("OPENAI_MAX_KEEPALIVE", "64"))
+# shortened text-embedding-3 vectors (e.g. 512); must match the vector(N) columns. 0 = model default
+EMBED_DIMENSIONS = int(os.getenv("EMBED_DIMENSIONS", "0"))
+EMBED_KW = {"dimensions": EMBED_DIMENSIONS} if EMBED_DIMENSIONS > 0 else {}
+
+
+# built once per process; double-checked locks because review_many threads can hit a cold start together
+_http: Optional[httpx.Client] = None
+_http_lock = threading.Lock()
+_client: Optional[OpenAI] = None
+_client_lock = threading.Lock()
+
+
+def get_http() -> httpx.Client:
+    # the one keep-alive (HTTP/2 when h2 is installed) pool for LLM traffic; thread-safe
+    global _http
+    if _http is None:
+        with _http_lock:
+            if _http is None:
+                try:
+                    import h2  # noqa: F401  (httpx[http2])
+                    http2 = True
+                except ImportError:
+                    http2 = False
+                _http = httpx.Client(
+                    http2=http2,
+                    timeout=OPENAI_TIMEOUT_SEC,
+                    limits=httpx.Limits(max_connections=OPENAI_MAX_CONNECTIONS,
+                                        max_keepalive_connections=OPENAI_MAX_KEEPALIVE),
+                )
+    return _http
+
+
+def get_client() -> OpenAI:
+    # one client (and one connection pool) per process, shared by every agent;
+    # built on first use so importing an agent never needs the key
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                key = os.getenv("OPENAI_API_KEY")
+                if not key:
+                    raise RuntimeError("OPENAI_API_KEY is not set")
+                _client = OpenAI(api_key=key, http_client=get_http())
+    return _client
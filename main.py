@@ -10,23 +10,34 @@ from fastapi.responses import JSONResponse
 from pydantic import BaseModel, AnyHttpUrl, Field, EmailStr
 from psycopg_pool import ConnectionPool
 from psycopg.rows import dict_row
-from psycopg.types.json import Json
-from openai import OpenAI
+from psycopg.types.json import Json, set_json_loads
+from llm_client import get_client, EMBED_KW
+import orjson
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     raise RuntimeError("DATABASE_URL environment variable is not set")
 
 EMBED_MODEL = os.getenv("EMBED_MODEL", "text-embedding-3-small")
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "5"))
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 if not OPENAI_API_KEY:
     raise RuntimeError("OPENAI_API_KEY environment variable is not set")
 
-openai_client = OpenAI(api_key=OPENAI_API_KEY)
+openai_client = get_client()
+
+# jobs.output can be large; decode JSONB with orjson instead of stdlib json
+set_json_loads(orjson.loads)
 
 app = FastAPI(title="Aseon API", version="0.6.0")
 app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
-pool = ConnectionPool(conninfo=DATABASE_URL, min_size=1, max_size=5, kwargs={"row_factory": dict_row})
+# check= pings on checkout so a connection dropped by the server is replaced, not handed out
+# prepare_threshold stays at psycopg's default: start() runs multi-statement DDL, which
+# cannot be prepared; get_site_latest passes prepare=True for SQL_LATEST_JOBS itself
+pool = ConnectionPool(conninfo=DATABASE_URL, min_size=DB_POOL_MIN, max_size=DB_POOL_MAX,
+                      kwargs={"row_factory": dict_row},
+                      check=ConnectionPool.check_connection)
 app.state.pool = pool
 
 _llm_include_ok = False
@@ -107,6 +118,15 @@ CREATE INDEX IF NOT EXISTS kb_tags_idx ON kb_documents USING gin (tags);
 SQL_ALTER = """
 ALTER TABLE kb_documents ADD COLUMN IF NOT EXISTS content_hash TEXT;
 CREATE UNIQUE INDEX IF NOT EXISTS kb_dedup ON kb_documents(url, content_hash);
+CREATE INDEX IF NOT EXISTS jobs_site_type_done_finished
+  ON jobs(site_id, type, finished_at DESC NULLS LAST, created_at DESC) WHERE status='done';
+"""
+
+SQL_LATEST_JOBS = """
+SELECT DISTINCT ON (type) type, id, output, finished_at
+  FROM jobs
+ WHERE site_id=%s AND type = ANY(%s) AND status='done'
+ORDER BY type, finished_at DESC NULLS LAST, created_at DESC
 """
 
 def _maybe_build_vector_indexes(conn) -> None:
@@ -133,7 +153,7 @@ def _maybe_build_vector_indexes(conn) -> None:
 
 def _embed(text: str) -> List[float]:
     text = (text or "").strip()
-    resp = openai_client.embeddings.create(model=EMBED_MODEL, input=[text])
+    resp = openai_client.embeddings.create(model=EMBED_MODEL, input=[text], **EMBED_KW)
     return resp.data[0].embedding
 
 def _hash(text: str) -> str:
@@ -271,28 +291,31 @@ def get_account_by_email(email: EmailStr = Query(...)):
 @app.post("/sites", response_model=SiteOut)
 def create_site(body: SiteIn):
     with pool.connection() as c, c.cursor() as cur:
-        cur.execute("SELECT 1 FROM accounts WHERE id=%s",(body.account_id,))
-        if not cur.fetchone(): raise HTTPException(status_code=400, detail="account_id does not exist")
         url_norm = normalize_url(body.url)
+        # existence check and insert in one round-trip; no row back means no such account
         cur.execute("""
             INSERT INTO sites (account_id,url,language,country)
-            VALUES (%s,%s,%s,%s)
+            SELECT %s,%s,%s,%s
+             WHERE EXISTS (SELECT 1 FROM accounts WHERE id=%s)
             RETURNING id,account_id,url,language,country,created_at
-        """, (body.account_id, url_norm, body.language.lower(), body.country.upper()))
-        row = cur.fetchone(); c.commit(); return site_json(row)
+        """, (body.account_id, url_norm, body.language.lower(), body.country.upper(), body.account_id))
+        row = cur.fetchone()
+        if not row: raise HTTPException(status_code=400, detail="account_id does not exist")
+        c.commit(); return site_json(row)
 
 @app.post("/jobs", response_model=JobOut)
 def create_job(body: JobIn):
     with pool.connection() as c, c.cursor() as cur:
-        cur.execute("SELECT 1 FROM sites WHERE id=%s",(body.site_id,))
-        if not cur.fetchone(): raise HTTPException(status_code=400, detail="site_id does not exist")
         pj = Json(body.payload) if body.payload is not None else None
         cur.execute("""
             INSERT INTO jobs (site_id,type,payload)
-            VALUES (%s,%s,%s)
+            SELECT %s,%s,%s
+             WHERE EXISTS (SELECT 1 FROM sites WHERE id=%s)
             RETURNING id,site_id,type,payload,status,created_at,started_at,finished_at,error,output
-        """, (body.site_id, body.type, pj))
-        row = cur.fetchone(); c.commit(); return job_json(row)
+        """, (body.site_id, body.type, pj, body.site_id))
+        row = cur.fetchone()
+        if not row: raise HTTPException(status_code=400, detail="site_id does not exist")
+        c.commit(); return job_json(row)
 
 @app.get("/jobs/{job_id}", response_model=JobOut)
 def get_job(job_id: str):
@@ -315,20 +338,16 @@ def get_job_output(job_id: str):
 
 @app.get("/sites/{site_id}/latest")
 def get_site_latest(site_id: str, types: str = Query(..., description="comma-separated e.g. crawl,keywords,faq,schema")):
-    wanted = [t.strip() for t in types.split(",") if t.strip()]
+    wanted = list(dict.fromkeys(t.strip() for t in types.split(",") if t.strip()))
     if not wanted: raise HTTPException(status_code=400, detail="No types provided")
-    out: Dict[str, Any] = {}
+    out: Dict[str, Any] = {t: None for t in wanted}
     with pool.connection() as c, c.cursor() as cur:
-        for t in wanted:
-            cur.execute("""
-                SELECT id, output, finished_at
-                  FROM jobs
-                 WHERE site_id=%s AND type=%s AND status='done'
-              ORDER BY COALESCE(finished_at, created_at) DESC
-                 LIMIT 1
-            """, (site_id, t))
-            row = cur.fetchone()
-            out[t] = row if row else None
+        cur.execute(SQL_LATEST_JOBS, (site_id, wanted), prepare=True)
+        for row in cur.fetchall():
+            t = row.pop("type")
+            if not isinstance(row["output"], dict):
+                row["output"] = {}
+            out[t] = row
     return out
 
 @app.post("/kb/docs")
@@ -603,8 +622,7 @@ if not _route_exists("/llm/answer"):
                 with request.app.state.pool.connection() as conn:
                     ctx = _get_rag_context(conn, site_id=body.site_id, query=body.query, kb_tags=kb_tags)
 
-            client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-            resp = client.chat.completions.create(
+            resp = openai_client.chat.completions.create(
                 model=os.getenv("LLM_MODEL", "gpt-4o-mini"),
                 temperature=0.2,
                 messages=_build_llm_messages(ctx, body.query, body.format or "markdown"),
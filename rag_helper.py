@@ -1,17 +1,17 @@
 # rag_helper.py
 import os, json, re, time
-from typing import List, Dict, Any, Optional
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Tuple
 from psycopg.rows import dict_row
-from openai import OpenAI
 from random import random
 from urllib.parse import urlsplit, urlunsplit
+from llm_client import get_client as _get_client, EMBED_KW, EMBED_DIMENSIONS
 
 EMBED_MODEL = os.getenv("EMBED_MODEL", "text-embedding-3-small")  # 1536-dim
 OPENAI_TIMEOUT_SEC = float(os.getenv("OPENAI_TIMEOUT_SEC", "20"))
 OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "3"))
 CONTEXT_CHAR_BUDGET = int(os.getenv("RAG_CHAR_BUDGET", "9000"))
-
-client = OpenAI(api_key=os.environ["OPENAI_API_KEY"])
+EMBED_CACHE_SIZE = int(os.getenv("RAG_EMBED_CACHE_SIZE", "512"))  # query embeddings, per process
 
 def _trim(s: str, max_chars: int = 1200) -> str:
     s = re.sub(r"\s+", " ", (s or "").strip())
@@ -20,22 +20,31 @@ def _trim(s: str, max_chars: int = 1200) -> str:
 def _retry_sleep(attempt: int) -> float:
     return min(2 ** attempt + random(), 8.0)
 
-def embed(text: str) -> List[float]:
+@lru_cache(maxsize=EMBED_CACHE_SIZE)
+def _embed_cached(text: str) -> Tuple[float, ...]:
     last_err = None
     for attempt in range(OPENAI_MAX_RETRIES):
         try:
-            resp = client.embeddings.create(
+            resp = _get_client().embeddings.create(
                 model=EMBED_MODEL,
-                input=[text or ""],
+                input=[text],
                 timeout=OPENAI_TIMEOUT_SEC,
+                **EMBED_KW,
             )
-            return resp.data[0].embedding
+            return tuple(resp.data[0].embedding)
         except Exception as e:
             last_err = e
             time.sleep(_retry_sleep(attempt))
-    dim = 1536 if "small" in EMBED_MODEL else (3072 if "large" in EMBED_MODEL else 1536)
-    print(json.dumps({"level":"ERROR","msg":"embed_failed","error":str(last_err)[:300]}), flush=True)
-    return [0.0] * dim
+    # raising keeps failures out of the cache
+    raise RuntimeError(str(last_err))
+
+def embed(text: str) -> List[float]:
+    try:
+        return list(_embed_cached(text or ""))
+    except Exception as e:
+        dim = EMBED_DIMENSIONS or (3072 if "large" in EMBED_MODEL else 1536)
+        print(json.dumps({"level":"ERROR","msg":"embed_failed","error":str(e)[:300]}), flush=True)
+        return [0.0] * dim
 
 def _parse_tags(tags: Optional[List[str]]) -> Optional[List[str]]:
     if not tags: return None
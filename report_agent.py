@@ -24,10 +24,14 @@ Aseon — Unified Report Agent (SEO • GEO • AEO)
 """
 
 from __future__ import annotations
-import json
+import io
 import re
 import os
 import httpx
+import orjson
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from typing import Any, Dict, List, Optional, Tuple
 from urllib.parse import urljoin, urlparse
 
@@ -55,14 +59,23 @@ except Exception:
 
 UA = "aseon-report-agent/1.0 (+https://www.aseon.io/)"
 TIMEOUT = int(os.getenv("HTTP_TIMEOUT_SECONDS", "30"))
+FETCH_CONCURRENCY = max(1, int(os.getenv("REPORT_FETCH_CONCURRENCY", "6")))
 
 _WS = re.compile(r"\s+")
 def norm(x: str) -> str:
     return _WS.sub(" ", (x or "").strip())
 
+def pretty_jsonld(obj: Any) -> str:
+    return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode("utf-8")
+
+@lru_cache(maxsize=4096)
+def _origin(u: str) -> tuple:
+    # base_url is compared against every link on every page; parse each URL once
+    p = urlparse(u)
+    return p.scheme, p.netloc.lower()
+
 def is_same_site(a: str, b: str) -> bool:
-    pa, pb = urlparse(a), urlparse(b)
-    return pa.netloc.lower() == pb.netloc.lower() and pa.scheme == pb.scheme
+    return _origin(a) == _origin(b)
 
 def safe_get(url: str) -> str:
     with httpx.Client(timeout=TIMEOUT, follow_redirects=True, headers={"User-Agent": UA}) as client:
@@ -70,6 +83,19 @@ def safe_get(url: str) -> str:
         r.raise_for_status()
         return r.text
 
+def _try_get(url: str) -> Optional[str]:
+    try:
+        return safe_get(url)
+    except Exception:
+        return None
+
+def fetch_many(urls: List[str]) -> List[Optional[str]]:
+    """Fetch pages concurrently; result i is the HTML of urls[i] or None on failure."""
+    if len(urls) <= 1 or FETCH_CONCURRENCY == 1:
+        return [_try_get(u) for u in urls]
+    with ThreadPoolExecutor(max_workers=min(FETCH_CONCURRENCY, len(urls))) as ex:
+        return list(ex.map(_try_get, urls))
+
 def discover_links(html: str, base_url: str) -> List[str]:
     soup = BeautifulSoup(html, "lxml")
     links = []
@@ -124,8 +150,8 @@ class GEOSummary(BaseModel):
     has_website_schema: bool = False
     issues: List[str] = Field(default_factory=list)
 
-def parse_page_seo(html: str, url: str) -> PageSEO:
-    soup = BeautifulSoup(html, "lxml")
+def parse_page_seo(html: str, url: str, soup: Optional[BeautifulSoup] = None) -> PageSEO:
+    soup = soup if soup is not None else BeautifulSoup(html, "lxml")
     title = soup.title.get_text(strip=True) if soup.title else None
     md = soup.find("meta", attrs={"name": "description"})
     meta_description = md.get("content") if md else None
@@ -172,14 +198,14 @@ def score_page_seo(ps: PageSEO) -> PageSEOIssues:
         og_issue=og_issue
     )
 
-def parse_geo_schema(html: str) -> GEOSummary:
-    soup = BeautifulSoup(html, "lxml")
+def parse_geo_schema(html: str, soup: Optional[BeautifulSoup] = None) -> GEOSummary:
+    soup = soup if soup is not None else BeautifulSoup(html, "lxml")
     has_org = False
     has_site = False
     for tag in soup.find_all("script", type="application/ld+json"):
         raw = tag.string or ""
         try:
-            data = json.loads(raw)
+            data = orjson.loads(raw)
         except Exception:
             continue
         blocks = data if isinstance(data, list) else [data]
@@ -250,7 +276,7 @@ def aeo_faq_only(url: str) -> AEOFAQSection:
     # schema FAQ
     for tag in soup.find_all("script", type="application/ld+json"):
         try:
-            data = json.loads(tag.string or "")
+            data = orjson.loads(tag.string or "")
         except Exception:
             continue
         blocks = data if isinstance(data, list) else [data]
@@ -374,15 +400,14 @@ def build_full_report(base_url: str, site_id: Optional[str] = None, max_pages: i
     aeo_scorecards: List[AEOScoreRow] = []
 
     homepage_html = None
+    homepage_soup = None
     faq_url: Optional[str] = None
 
-    for u in urls:
-        try:
-            html = safe_get(u)
-        except Exception:
+    for u, html in zip(urls, fetch_many(urls)):
+        if html is None:
             continue
         soup = BeautifulSoup(html, "lxml")
-        ps = parse_page_seo(html, u)
+        ps = parse_page_seo(html, u, soup=soup)
         issues = score_page_seo(ps)
 
         # SEO fixes
@@ -428,10 +453,11 @@ def build_full_report(base_url: str, site_id: Optional[str] = None, max_pages: i
         # capture homepage html for GEO
         if u.rstrip("/") == base_url.rstrip("/"):
             homepage_html = html
+            homepage_soup = soup
 
     geo_reco: List[str] = []
     if homepage_html:
-        geo = parse_geo_schema(homepage_html)
+        geo = parse_geo_schema(homepage_html, soup=homepage_soup)
         if not geo.has_org_schema:
             geo_reco.append("Add Organization JSON-LD on the homepage with logo and sameAs.")
         if not geo.has_website_schema:
@@ -446,10 +472,11 @@ def build_full_report(base_url: str, site_id: Optional[str] = None, max_pages: i
 
     aeo_section = aeo_faq_only(faq_url)
 
+    field_counts = Counter(r.field for r in seo_rows)
     summary = (
         f"Scope: {len(urls)} pagina's gecrawld op {urlparse(base_url).netloc}. "
-        f"SEO: {len([r for r in seo_rows if r.field=='title'])} titels en "
-        f"{len([r for r in seo_rows if r.field=='meta_description'])} meta-descriptions vragen werk; "
+        f"SEO: {field_counts['title']} titels en "
+        f"{field_counts['meta_description']} meta-descriptions vragen werk; "
         f"{len(can_patches)} canonical- en {len(og_patches)} Open Graph-patches voorgesteld. "
         f"AEO: FAQ geaudit op {faq_url}; {aeo_section.items_reviewed} items beoordeeld."
     )
@@ -469,77 +496,100 @@ def build_full_report(base_url: str, site_id: Optional[str] = None, max_pages: i
 
 # ======= Markdown renderers =======
 
-def render_full_markdown(rep: FullReport) -> str:
-    lines: List[str] = []
-    lines.append(f"SEO • GEO • AEO Audit - {rep.base_url}")
-    lines.append("")
-    lines.append(f"Executive summary")
-    lines.append(rep.executive_summary)
-    lines.append("")
-    lines.append("AEO — FAQ (only)")
-    lines.append(f"URL: {rep.aeo_faq.url if rep.aeo_faq else '-'}")
-    if rep.aeo_faq:
-        lines.append(f"Found: {rep.aeo_faq.found_faq} | Items: {rep.aeo_faq.items_reviewed} | Suggestions: {rep.aeo_faq.suggestions_count}")
-        if rep.aeo_faq.existing_questions:
-            lines.append("Existing questions:")
-            for i,q in enumerate(rep.aeo_faq.existing_questions,1):
-                lines.append(f"{i}. {q}")
-        lines.append("")
-        lines.append("Evaluations:")
-        for i,row in enumerate(rep.aeo_faq.evaluations,1):
-            lines.append(f"{i}. {row.question} — {row.status}")
+def _md_summary(w, rep: FullReport) -> None:
+    w("Executive summary\n")
+    w(rep.executive_summary + "\n")
+
+def _md_aeo_faq(w, rep: FullReport) -> None:
+    faq = rep.aeo_faq
+    w("AEO — FAQ (only)\n")
+    w(f"URL: {faq.url if faq else '-'}\n")
+    if faq:
+        w(f"Found: {faq.found_faq} | Items: {faq.items_reviewed} | Suggestions: {faq.suggestions_count}\n")
+        if faq.existing_questions:
+            w("Existing questions:\n")
+            for i,q in enumerate(faq.existing_questions,1):
+                w(f"{i}. {q}\n")
+        w("\n")
+        w("Evaluations:\n")
+        for i,row in enumerate(faq.evaluations,1):
+            w(f"{i}. {row.question} — {row.status}\n")
             if row.issues:
-                lines.append("   Issues: " + "; ".join(row.issues))
+                w("   Issues: " + "; ".join(row.issues) + "\n")
             if row.suggested_question:
-                lines.append("   Improved Q: " + row.suggested_question)
+                w("   Improved Q: " + row.suggested_question + "\n")
             if row.suggested_answer:
-                lines.append("   Improved A: " + row.suggested_answer)
-        lines.append("")
-        lines.append("FAQPage JSON-LD:")
-        lines.append("```json")
-        lines.append(json.dumps(rep.aeo_faq.faqpage_jsonld, ensure_ascii=False, indent=2))
-        lines.append("```")
-    lines.append("")
-    lines.append("SEO — Concrete text fixes")
+                w("   Improved A: " + row.suggested_answer + "\n")
+        w("\n")
+        w("FAQPage JSON-LD:\n")
+        w("```json\n")
+        w(pretty_jsonld(faq.faqpage_jsonld) + "\n")
+        w("```\n")
+
+def _md_seo(w, rep: FullReport) -> None:
+    w("SEO — Concrete text fixes\n")
     for r in rep.seo_fixes:
-        lines.append(f"{r.url} | {r.field} | {r.issue} | Proposed: {r.proposed}")
-    lines.append("")
-    lines.append("HTML patches — Canonical")
+        w(f"{r.url} | {r.field} | {r.issue} | Proposed: {r.proposed}\n")
+
+def _md_canonical(w, rep: FullReport) -> None:
+    w("HTML patches — Canonical\n")
     for p in rep.canonical_patches:
-        lines.append(f"{p.url} | {p.issue} | {p.patch}")
-    lines.append("")
-    lines.append("HTML patches — Open Graph")
+        w(f"{p.url} | {p.issue} | {p.patch}\n")
+
+def _md_open_graph(w, rep: FullReport) -> None:
+    w("HTML patches — Open Graph\n")
     for p in rep.og_patches:
-        lines.append(f"{p.url} | {p.issue} | {p.patch}")
-    lines.append("")
-    lines.append("GEO Recommendations")
+        w(f"{p.url} | {p.issue} | {p.patch}\n")
+
+def _md_geo(w, rep: FullReport) -> None:
+    w("GEO Recommendations\n")
     for g in rep.geo_recommendations:
-        lines.append(f"- {g}")
-    return "\n".join(lines)
+        w(f"- {g}\n")
+
+# section name -> writer; dict order is the default report order
+FULL_MD_SECTIONS = {
+    "summary": _md_summary,
+    "aeo_faq": _md_aeo_faq,
+    "seo": _md_seo,
+    "canonical": _md_canonical,
+    "open_graph": _md_open_graph,
+    "geo": _md_geo,
+}
+
+def render_full_markdown(rep: FullReport, sections: Optional[List[str]] = None) -> str:
+    buf = io.StringIO()
+    w = buf.write
+    w(f"SEO • GEO • AEO Audit - {rep.base_url}\n")
+    for name in (sections or FULL_MD_SECTIONS):
+        fn = FULL_MD_SECTIONS.get(name)
+        if fn:
+            w("\n")
+            fn(w, rep)
+    return buf.getvalue().rstrip("\n")
 
 def render_aeo_markdown(aeo: AEOFAQSection) -> str:
-    lines = []
-    lines.append(f"# AEO — FAQ Audit")
-    lines.append(f"URL: {aeo.url}")
-    lines.append(f"Found: {aeo.found_faq} | Items: {aeo.items_reviewed} | Suggestions: {aeo.suggestions_count}")
+    buf = io.StringIO()
+    w = buf.write
+    w("# AEO — FAQ Audit\n")
+    w(f"URL: {aeo.url}\n")
+    w(f"Found: {aeo.found_faq} | Items: {aeo.items_reviewed} | Suggestions: {aeo.suggestions_count}\n")
     if aeo.existing_questions:
-        lines.append("\n## Bestaande vragen")
-        for i,q in enumerate(aeo.existing_questions,1):
-            lines.append(f"{i}. {q}")
-    lines.append("\n## Beoordelingen")
+        w("\n## Bestaande vragen\n")
+        w("".join(f"{i}. {q}\n" for i,q in enumerate(aeo.existing_questions,1)))
+    w("\n## Beoordelingen\n")
     for i,row in enumerate(aeo.evaluations,1):
-        lines.append(f"### {i}. {row.question} — {row.status}")
+        w(f"### {i}. {row.question} — {row.status}\n")
         if row.issues:
-            lines.append(f"- Issues: " + "; ".join(row.issues))
+            w("- Issues: " + "; ".join(row.issues) + "\n")
         if row.suggested_question:
-            lines.append(f"- Verbeterde vraag: {row.suggested_question}")
+            w(f"- Verbeterde vraag: {row.suggested_question}\n")
         if row.suggested_answer:
-            lines.append(f"- Verbeterd antwoord: {row.suggested_answer}")
-    lines.append("\n## FAQPage JSON-LD")
-    lines.append("```json")
-    lines.append(json.dumps(aeo.faqpage_jsonld, ensure_ascii=False, indent=2))
-    lines.append("```")
-    return "\n".join(lines)
+            w(f"- Verbeterd antwoord: {row.suggested_answer}\n")
+    w("\n## FAQPage JSON-LD\n")
+    w("```json\n")
+    w(pretty_jsonld(aeo.faqpage_jsonld) + "\n")
+    w("```")
+    return buf.getvalue()
 
 # ======= FastAPI App / Routes =======
 
@@ -563,10 +613,12 @@ def report_full(
 def report_full_md(
     base_url: str = Query(...),
     site_id: Optional[str] = Query(None),
-    max_pages: int = Query(20, ge=1, le=100)
+    max_pages: int = Query(20, ge=1, le=100),
+    sections: Optional[str] = Query(None, description="comma-separated, e.g. summary,seo,geo")
 ):
     rep = build_full_report(base_url=base_url, site_id=site_id, max_pages=max_pages)
-    md = render_full_markdown(rep)
+    wanted = [x.strip() for x in sections.split(",") if x.strip()] if sections else None
+    md = render_full_markdown(rep, sections=wanted)
     return PlainTextResponse(md, media_type="text/markdown; charset=utf-8")
 
 @app.post("/report/aeo/faq-only")
@@ -1,12 +1,50 @@
 # schema_agent.py
-import os, json
+import os, sys, json, time, hashlib, threading, textwrap, random, queue, atexit, logging, sqlite3
+from logging.handlers import QueueHandler, QueueListener
+import orjson
+from functools import lru_cache
 from urllib.parse import urlparse
-from openai import OpenAI
+from openai import RateLimitError, APITimeoutError, APIConnectionError, InternalServerError
+from llm_client import get_client as _get_client, EMBED_KW
 
 MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
-client = OpenAI(api_key=os.environ["OPENAI_API_KEY"])
+SCHEMA_CACHE_TTL_SEC = float(os.getenv("SCHEMA_CACHE_TTL_SEC", "86400"))  # 0 disables
+SCHEMA_CACHE_MAX = int(os.getenv("SCHEMA_CACHE_MAX", "1024"))
+SCHEMA_CACHE_DB = os.getenv("SCHEMA_CACHE_DB", "")  # sqlite path for a cache that survives restarts; empty = off
+SCHEMA_CACHE_DB_TTL_SEC = float(os.getenv("SCHEMA_CACHE_DB_TTL_SEC", str(7 * 86400)))
+PROMPT_VERSION = "2"  # bump whenever _BASE_SYS or the prompt layout changes
+# routes all schema calls to the same server-side prompt cache bucket; empty = not sent
+PROMPT_CACHE_KEY = os.getenv("SCHEMA_PROMPT_CACHE_KEY", "schema_agent")
+SCHEMA_LLM_ATTEMPTS = max(1, int(os.getenv("SCHEMA_LLM_ATTEMPTS", "3")))
+SCHEMA_REPAIR_ATTEMPTS = max(0, int(os.getenv("SCHEMA_REPAIR_ATTEMPTS", "1")))  # fix passes on invalid LLM output
+SCHEMA_CTX_MAX_CHARS = int(os.getenv("SCHEMA_CTX_MAX_CHARS", "2000"))  # longer rag_context gets trimmed
+SCHEMA_CTX_TOP_K = int(os.getenv("SCHEMA_CTX_TOP_K", "8"))  # paragraphs kept when trimming
+EMBED_MODEL = os.getenv("EMBED_MODEL", "text-embedding-3-small")
+# no context and no usable extras: return the stub instead of letting the LLM invent fields
+SKIP_TRIVIAL_LLM = os.getenv("ASEON_SKIP_TRIVIAL_LLM", "0") == "1"
+FALLBACK_MODEL = os.getenv("OPENAI_FALLBACK_MODEL", "")  # tried after MODEL fails; empty = none
+_MODELS = tuple(dict.fromkeys(m for m in (MODEL, FALLBACK_MODEL) if m))
+_TRANSIENT = (RateLimitError, APITimeoutError, APIConnectionError, InternalServerError)
 
-_BASE_SYS = """
+# JSON lines as before, but written by a listener thread: callers only enqueue
+_log_q: queue.Queue = queue.Queue(-1)
+_log_handler = logging.StreamHandler(sys.stdout)
+_log_handler.setFormatter(logging.Formatter("%(message)s"))
+_log_listener = QueueListener(_log_q, _log_handler)
+_log_listener.start()
+atexit.register(_log_listener.stop)  # drains what is still queued
+LOGGER = logging.getLogger("schema_agent")
+if not LOGGER.handlers:
+    LOGGER.addHandler(QueueHandler(_log_q))
+LOGGER.setLevel(logging.INFO)
+LOGGER.propagate = False
+
+def _log(level: int, msg: str, **kw) -> None:
+    if LOGGER.isEnabledFor(level):
+        LOGGER.log(level, json.dumps({"level":logging.getLevelName(level).replace("WARNING","WARN"),"msg":msg,**kw}))
+
+# frozen: byte-identical on every call so the system prefix stays cacheable
+_BASE_SYS = textwrap.dedent("""
 You are an expert Schema.org JSON-LD generator.
 Rules:
 - Return a single valid JSON object, no comments/explanations.
@@ -18,85 +56,282 @@ Types:
 3) FAQPage: mainEntity:[{ @type:Question, name, acceptedAnswer{ @type:Answer, text } }]
    - Answers ≤ 80 words, factual.
 4) OfferCatalog/Product: name, description, url, itemListElement[].
-"""
+""").strip()
+
+# user message: plain lines instead of a JSON envelope around the inputs
+_PROMPT = "Generate {bt} JSON-LD.\nName: {name}\nURL: {url}\nLanguage: {lang}\n{data}Context:\n{ctx}"
+
+# shared, constant system message: every call sends the same prefix
+_SYS_MSG = {"role":"system","content":_BASE_SYS}
+
+# blake2b(version, model, system, prompt) -> (stored_at, raw completion); a fresh dict is parsed per hit
+# optional second tier: sqlite table llm_cache at SCHEMA_CACHE_DB, shared across restarts
+_cache: dict = {}
+_cache_lock = threading.Lock()
+
+def _cache_key(prompt: str) -> str:
+    return hashlib.blake2b((PROMPT_VERSION + "\0" + MODEL + "\0" + _BASE_SYS + "\0" + prompt).encode("utf-8"), digest_size=16).hexdigest()
+
+_db_conn: sqlite3.Connection | None = None
+_db_lock = threading.Lock()
+
+def _db() -> sqlite3.Connection:
+    global _db_conn
+    if _db_conn is None:
+        with _db_lock:
+            if _db_conn is None:
+                db = sqlite3.connect(SCHEMA_CACHE_DB, check_same_thread=False, isolation_level=None)
+                db.execute("PRAGMA journal_mode=WAL")
+                db.execute("CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, response TEXT NOT NULL, created_at REAL NOT NULL)")
+                _db_conn = db
+    return _db_conn
 
-def _call_llm(prompt: str) -> dict | None:
+def _db_get(key: str) -> str | None:
     try:
-        resp = client.chat.completions.create(
-            model=MODEL,
-            messages=[{"role":"system","content":_BASE_SYS},{"role":"user","content":prompt}],
-            response_format={"type":"json_object"},
-            temperature=0.3,
-        )
-        return json.loads(resp.choices[0].message.content)
-    except Exception:
+        with _cache_lock:
+            row = _db().execute("SELECT response, created_at FROM llm_cache WHERE key=?", (key,)).fetchone()
+    except sqlite3.Error as e:
+        _log(logging.WARNING, "schema_cache_db_failed", error=str(e)[:200])
+        return None
+    if not row or time.time() - row[1] > SCHEMA_CACHE_DB_TTL_SEC:
+        return None
+    return row[0]
+
+def _db_set(key: str, content: str) -> None:
+    try:
+        with _cache_lock:
+            _db().execute("INSERT OR REPLACE INTO llm_cache (key, response, created_at) VALUES (?,?,?)",
+                          (key, content, time.time()))
+    except sqlite3.Error as e:
+        _log(logging.WARNING, "schema_cache_db_failed", error=str(e)[:200])
+
+def _cache_get(key: str) -> str | None:
+    if SCHEMA_CACHE_TTL_SEC > 0:
+        with _cache_lock:
+            hit = _cache.get(key)
+            if hit and time.time() - hit[0] <= SCHEMA_CACHE_TTL_SEC:
+                return hit[1]
+            _cache.pop(key, None)
+    if not SCHEMA_CACHE_DB:
+        return None
+    content = _db_get(key)
+    if content is not None and SCHEMA_CACHE_TTL_SEC > 0:
+        _cache_set(key, content, persist=False)  # warm the process tier
+    return content
+
+def _cache_set(key: str, content: str, persist: bool = True) -> None:
+    if SCHEMA_CACHE_TTL_SEC > 0:
+        with _cache_lock:
+            if len(_cache) >= SCHEMA_CACHE_MAX:
+                _cache.pop(next(iter(_cache)))  # oldest insert
+            _cache[key] = (time.time(), content)
+    if persist and SCHEMA_CACHE_DB:
+        _db_set(key, content)
+
+def _create(model: str, messages: list, **kw) -> str:
+    # the only retry layer (SDK retries off): transient errors (429/5xx/timeouts), jittered exponential backoff
+    client = _get_client().with_options(max_retries=0)
+    for attempt in range(SCHEMA_LLM_ATTEMPTS):
+        try:
+            resp = client.chat.completions.create(model=model, messages=messages, temperature=0.3, **kw)
+            return resp.choices[0].message.content
+        except _TRANSIENT as e:
+            if attempt + 1 >= SCHEMA_LLM_ATTEMPTS:
+                raise
+            _log(logging.WARNING, "schema_llm_retry", model=model, attempt=attempt+1, error=str(e)[:200])
+            time.sleep(min(0.5 * 2 ** attempt, 8.0) + random.random() * 0.25)
+
+_EXTRA = {"extra_body": {"prompt_cache_key": f"{PROMPT_CACHE_KEY}_v{PROMPT_VERSION}"}} if PROMPT_CACHE_KEY else {}
+
+# @type -> fields that must be non-empty; unlisted types only need @type
+_REQUIRED = {
+    "FAQPage": ("mainEntity",),
+    "Article": ("headline",),
+    "Organization": ("name",),
+    "LocalBusiness": ("name",),
+}
+_PROP_TYPES = {"mainEntity": {"type":"array","items":{"type":"object"}}}
+
+def _ld_schema(required: tuple) -> dict:
+    return {"type":"object",
+            "properties":{"@context":{"type":"string"},"@type":{"type":"string"},
+                          **{k: _PROP_TYPES.get(k, {"type":"string"}) for k in required}},
+            "required":["@type", *required]}
+
+# JSON Schema per @type, built from _REQUIRED; non-strict because JSON-LD objects stay open-ended
+_RESPONSE_SCHEMAS = {t: _ld_schema(req) for t, req in _REQUIRED.items()}
+
+def _response_format(bt: str | None) -> dict:
+    schema = _RESPONSE_SCHEMAS.get(bt)
+    if schema is None:
+        return {"type":"json_object"}
+    return {"type":"json_schema","json_schema":{"name":"schema_ld","strict":False,"schema":schema}}
+
+def _complete(messages: list, bt: str | None = None) -> tuple[str, dict] | None:
+    # JSON mode only: a second plain-text call repeated the whole prompt and rarely parsed better
+    rf = _response_format(bt)
+    for model in _MODELS:
         try:
-            resp = client.chat.completions.create(
-                model=MODEL,
-                messages=[{"role":"system","content":_BASE_SYS},{"role":"user","content":prompt}],
-                temperature=0.3,
-            )
-            return json.loads(resp.choices[0].message.content)
-        except Exception as e2:
-            print(json.dumps({"level":"ERROR","msg":"schema_llm_failed","error":str(e2)}), flush=True)
-            return None
+            content = _create(model, messages, response_format=rf, **_EXTRA)
+            data = orjson.loads(content)
+        except Exception as e:
+            _log(logging.ERROR, "schema_llm_failed", model=model, error=str(e))
+            continue
+        return content, data
+    return None
+
+def _call_llm(prompt: str, bt: str | None = None, build=None) -> dict | None:
+    # keyed on `prompt`; `build()` makes the text actually sent, and only runs on a miss
+    key = _cache_key(prompt)
+    cached = _cache_get(key)
+    if cached is not None:
+        return orjson.loads(cached)
+    res = _complete([_SYS_MSG, {"role":"user","content":build() if build else prompt}], bt)
+    if res is None:
+        return None
+    content, data = res
+    _cache_set(key, content)
+    return data
+
+_SCHEMA_CTX = "https://schema.org"
+
+@lru_cache(maxsize=2048)
+def _netloc(url: str) -> str:
+    return urlparse(url).netloc
 
 def _fallback_schema(biz_type: str, site_name: str, site_url: str) -> dict:
-    return {"@context":"https://schema.org","@type":biz_type,"name":site_name,"url":site_url}
+    return {"@context":_SCHEMA_CTX,"@type":biz_type,"name":site_name,"url":site_url}
+
+_ORG_FIELDS = ("logo", "sameAs", "address", "telephone", "description")
+_PRODUCT_FIELDS = ("description", "image", "offers", "brand", "sku")
+
+def _build_deterministic(bt: str, name: str, site_url: str, extras: dict) -> dict | None:
+    """JSON-LD straight from inputs for types the LLM would only reshape; None = needs the LLM."""
+    if bt in ("Organization", "LocalBusiness"):
+        data = {"@context":_SCHEMA_CTX,"@type":bt,"name":name,"url":site_url}
+        data.update({k: extras[k] for k in _ORG_FIELDS if extras.get(k)})
+        return data
+    if bt == "Product" and extras.get("name") and extras.get("url"):
+        data = {"@context":_SCHEMA_CTX,"@type":"Product","name":extras["name"],"url":extras["url"]}
+        data.update({k: extras[k] for k in _PRODUCT_FIELDS if extras.get(k)})
+        return data
+    return None
+
+def _build_faqpage_from_faqs(faqs, count: int) -> dict | None:
+    """FAQPage from existing {q, a} pairs (first `count`); None when none are usable."""
+    if not isinstance(faqs, list):
+        return None
+    main = []
+    for f in faqs[:count]:
+        if not isinstance(f, dict):
+            continue
+        q = (f.get("q") or "").strip()
+        a = (f.get("a") or "").strip()
+        if not q or not a:
+            continue
+        main.append({
+            "@type": "Question",
+            "name": q,
+            "acceptedAnswer": {"@type": "Answer", "text": a}
+        })
+    if not main:
+        return None
+    return {"@context":_SCHEMA_CTX,"@type":"FAQPage","mainEntity": main}
 
 def validate_schema(data: dict, biz_type: str) -> tuple[bool, str | None]:
     if not isinstance(data, dict): return False, "Schema is not a dict"
     t = data.get("@type")
     if not t: return False, "Missing @type"
-    if t == "FAQPage" and not data.get("mainEntity"): return False, "FAQPage missing mainEntity"
-    if t == "Article" and not data.get("headline"): return False, "Article missing headline"
-    if t in ("Organization","LocalBusiness") and not data.get("name"): return False, "Organization missing name"
+    if not isinstance(t, str): return True, None
+    for k in _REQUIRED.get(t, ()):
+        if not data.get(k):
+            return False, f"{t} missing {k}"
     return True, None
 
+def _trim_context(ctx: str, query: str) -> str:
+    """Top-k paragraphs of a long rag_context by similarity to `query`, in original order."""
+    if len(ctx) <= SCHEMA_CTX_MAX_CHARS:
+        return ctx
+    paras = [p.strip() for p in ctx.split("\n\n") if p.strip()]
+    if len(paras) <= SCHEMA_CTX_TOP_K:
+        return ctx[:SCHEMA_CTX_MAX_CHARS]
+    try:
+        # one request embeds the query and every paragraph
+        resp = _get_client().embeddings.create(model=EMBED_MODEL, input=[query, *paras], **EMBED_KW)
+        vecs = [d.embedding for d in sorted(resp.data, key=lambda d: d.index)]
+    except Exception as e:
+        _log(logging.WARNING, "schema_ctx_trim_failed", error=str(e)[:200])
+        return ctx[:SCHEMA_CTX_MAX_CHARS]
+    q = vecs[0]
+    # text-embedding-3 vectors are unit length: dot product == cosine
+    scores = [sum(a * b for a, b in zip(q, v)) for v in vecs[1:]]
+    keep = sorted(sorted(range(len(paras)), key=scores.__getitem__, reverse=True)[:SCHEMA_CTX_TOP_K])
+    return "\n\n".join(paras[i] for i in keep)[:SCHEMA_CTX_MAX_CHARS]
+
 def generate_schema(biz_type: str, site_name: str | None, site_url: str,
                     language: str | None = None, extras: dict | None = None,
                     rag_context: str | None = None) -> dict:
     extras = extras or {}
     bt = (biz_type or "Organization").strip()
-    name = site_name or urlparse(site_url).netloc
+    name = site_name or _netloc(site_url)
     count = int(extras.get("count", 3))
 
     # ---- Direct build for FAQPage if we already have FAQs ----
-    if bt == "FAQPage" and isinstance(extras.get("faqs"), list) and extras["faqs"]:
-        faqs = extras["faqs"][:count]
-        main = []
-        for f in faqs:
-            q = (f.get("q") or "").strip()
-            a = (f.get("a") or "").strip()
-            if not q or not a:
-                continue
-            main.append({
-                "@type": "Question",
-                "name": q,
-                "acceptedAnswer": {"@type": "Answer", "text": a}
-            })
-        if main:
-            return {"@context":"https://schema.org","@type":"FAQPage","mainEntity": main}
-        # if somehow empty, fall through to fallback
+    if bt == "FAQPage":
+        built = _build_faqpage_from_faqs(extras.get("faqs"), count)
+        if built is not None and validate_schema(built, bt)[0]:
+            return built
+        # no usable FAQs: fall through to the LLM / fallback
+
+    # ---- Deterministic build when there is no extra context for the LLM to use ----
+    if not rag_context:
+        data = _build_deterministic(bt, name, site_url, extras)
+        if data is not None and validate_schema(data, bt)[0]:
+            return data
+        # control keys from run_schema carry no schema content
+        if SKIP_TRIVIAL_LLM and not any(v for k, v in extras.items() if k not in ("count", "faqs", "use_context")):
+            return _fallback_schema(bt, name, site_url)
 
     # ---- LLM path for other types / fallback ----
-    payload = {
-        "biz_type": bt,
-        "defaults": {"name": name, "url": site_url, "language": language},
-        "extras": extras,
-        "context": rag_context or "(no extra site context)"
-    }
-    prompt = f"Generate a JSON-LD object for:\n{json.dumps(payload, ensure_ascii=False)}"
-    data = _call_llm(prompt) or _fallback_schema(bt, name, site_url)
-
-    # Small deterministic tweak for Article: prefer extras.url as mainEntityOfPage
-    if bt == "Article" and extras.get("url"):
-        data.setdefault("mainEntityOfPage", extras["url"])
-    data.setdefault("@context", "https://schema.org")
-    data.setdefault("@type", bt)
+    # only fields with content; count/use_context steer this function, not the schema
+    llm_extras = {k: v for k, v in extras.items() if v not in (None, "", [], {}) and k not in ("count", "use_context")}
+    if isinstance(llm_extras.get("faqs"), list):
+        llm_extras["faqs"] = llm_extras["faqs"][:count]  # only `count` can end up in the schema
+    # sorted keys: same inputs in a different key order hit the same cache entry
+    data_line = ("Data: " + orjson.dumps(llm_extras, option=orjson.OPT_SORT_KEYS).decode("utf-8") + "\n") if llm_extras else ""
+    fields = dict(bt=bt, name=name, url=site_url, lang=language or "en", data=data_line)
+    prompt = _PROMPT.format(**fields, ctx=rag_context or "(no extra site context)")
+    # cache on the untrimmed context: a hit skips the trim's embeddings request
+    build = (lambda: _PROMPT.format(**fields, ctx=_trim_context(rag_context, f"Generate {bt} schema for {name}"))
+             if rag_context else None)
+    data = _call_llm(prompt, bt, build)
+    from_llm = isinstance(data, dict) and bool(data)
+    if not from_llm:
+        data = _fallback_schema(bt, name, site_url)
+
+    def _finish(d: dict) -> dict:
+        # Small deterministic tweak for Article: prefer extras.url as mainEntityOfPage
+        if bt == "Article" and extras.get("url"):
+            d.setdefault("mainEntityOfPage", extras["url"])
+        d.setdefault("@context", _SCHEMA_CTX)
+        d.setdefault("@type", bt)
+        return d
 
+    data = _finish(data)
     ok, err = validate_schema(data, bt)
+    # hand the error back once instead of discarding a mostly-correct object
+    for _ in range(SCHEMA_REPAIR_ATTEMPTS if from_llm else 0):
+        if ok:
+            break
+        _log(logging.INFO, "schema_repair", error=err)
+        repair = (f"Fix this JSON-LD so it is a valid {bt}. Error: {err}. Keep every correct field.\nCurrent:\n"
+                  + orjson.dumps(data, option=orjson.OPT_SORT_KEYS).decode("utf-8"))
+        fixed = _call_llm(repair, bt)
+        if not isinstance(fixed, dict) or not fixed:
+            break
+        data = _finish(fixed)
+        ok, err = validate_schema(data, bt)
     if not ok:
-        print(json.dumps({"level":"WARN","msg":"schema_invalid","error":err}), flush=True)
+        _log(logging.WARNING, "schema_invalid", error=err)
         data = _fallback_schema(bt, name, site_url)
     return data
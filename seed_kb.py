@@ -1,20 +1,25 @@
 import os, sys, json, hashlib
 from typing import List, Dict, Any
 import psycopg
-from openai import OpenAI
+
+from llm_client import get_client, EMBED_KW
 
 DATABASE_URL = os.environ["DATABASE_URL"]
-OPENAI_API_KEY = os.environ["OPENAI_API_KEY"]
 EMBED_MODEL = os.getenv("EMBED_MODEL", "text-embedding-3-small")
+EMBED_BATCH = int(os.getenv("EMBED_BATCH", "256"))  # inputs per embeddings request (API max 2048)
 
-client = OpenAI(api_key=OPENAI_API_KEY)
+client = get_client()
 
 def _hash(text: str) -> str:
     return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
 
-def _embed(text: str):
-    resp = client.embeddings.create(model=EMBED_MODEL, input=[(text or "").strip()])
-    return resp.data[0].embedding
+def _embed_many(texts: List[str]) -> List[List[float]]:
+    # one request per EMBED_BATCH inputs instead of one per doc
+    out: List[List[float]] = []
+    for i in range(0, len(texts), EMBED_BATCH):
+        resp = client.embeddings.create(model=EMBED_MODEL, input=texts[i:i + EMBED_BATCH], **EMBED_KW)
+        out.extend(r.embedding for r in sorted(resp.data, key=lambda r: r.index))
+    return out
 
 def _load_yaml(path: str) -> List[Dict[str, Any]]:
     try:
@@ -140,32 +145,43 @@ def main():
     print(f"Seeding KB with {len(docs)} docs")
 
     with psycopg.connect(DATABASE_URL) as conn, conn.cursor() as cur:
-        inserted = 0; skipped = 0
+        # rows already seeded (same url + content) need neither an embedding nor an INSERT
+        cur.execute("SELECT url, content_hash FROM kb_documents")
+        seen = set(cur.fetchall())
+
+        pending = []; skipped = 0
         for d in docs:
             content = (d.get("content") or "").strip()
-            if not content:
+            key = (d.get("url"), _hash(content))
+            if not content or key in seen:
                 skipped += 1
                 continue
-            chash = _hash(content)
-            vec = _embed(content)
-            cur.execute("""
+            seen.add(key)
+            pending.append((d, content, key[1]))
+
+        contents = list(dict.fromkeys(c for _, c, _ in pending))
+        vec_map = dict(zip(contents, _embed_many(contents)))
+        rows = [(
+            d.get("source"),
+            d.get("url"),
+            d.get("title"),
+            d.get("tags") or [],
+            content,
+            vec_map[content],
+            chash
+        ) for d, content, chash in pending]
+
+        inserted = 0
+        if rows:
+            # pipelined by psycopg: one round-trip for the batch; rowcount sums the inserted rows
+            cur.executemany("""
                 INSERT INTO kb_documents (source,url,title,tags,content,embedding,content_hash)
                 VALUES (%s,%s,%s,%s,%s,%s,%s)
                 ON CONFLICT (url, content_hash) DO NOTHING
-            """, (
-                d.get("source"),
-                d.get("url"),
-                d.get("title"),
-                d.get("tags") or [],
-                content,
-                vec,
-                chash
-            ))
-            if cur.rowcount > 0:
-                inserted += 1
-            else:
-                skipped += 1
-        conn.commit()
+            """, rows)
+            inserted = max(cur.rowcount, 0)
+            conn.commit()
+        skipped += len(rows) - inserted
     print(json.dumps({"inserted": inserted, "skipped": skipped}))
 
 if __name__ == "__main__":